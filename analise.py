@@ -2,7 +2,12 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from datetime import datetime
-import numpy as np
+import io
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from utils.io import SCHEMA_VERSION, file_digest, load_sales
 
 # ========================================
 # CONFIGURAÇÃO DA PÁGINA
@@ -43,50 +48,7 @@ st.markdown("""
 # FUNÇÕES PRINCIPAIS
 # ========================================
 
-@st.cache_data
-def load_data(uploaded_file):
-    """Carrega e trata os dados do arquivo."""
-    try:
-        if uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file, parse_dates=True, dayfirst=True, infer_datetime_format=True)
-        else:
-            df = pd.read_excel(uploaded_file, parse_dates=True)
-        
-        # Padroniza nomes de colunas
-        df.columns = df.columns.str.lower().str.replace(' ', '_')
-        
-        # Identifica coluna de data automaticamente
-        date_cols = [col for col in df.columns if any(keyword in col for keyword in ['data', 'date', 'dt'])]
-        if date_cols:
-            df['data'] = pd.to_datetime(df[date_cols[0]], errors='coerce', dayfirst=True)
-        
-        # Verifica colunas essenciais
-        required_cols = {'valor': ['valor', 'total', 'venda', 'amount'],
-                        'empresa': ['empresa', 'cliente', 'customer'],
-                        'vendedor': ['vendedor', 'responsavel', 'seller']}
-        
-        for standard_col, possible_cols in required_cols.items():
-            for col in possible_cols:
-                if col in df.columns:
-                    df.rename(columns={col: standard_col}, inplace=True)
-                    break
-        
-        # Conversão de tipos e limpeza
-        df['valor'] = pd.to_numeric(df['valor'], errors='coerce')
-        df = df.dropna(subset=['data', 'valor'])
-        
-        # Adiciona colunas temporais
-        df['mês'] = df['data'].dt.to_period('M').astype(str)
-        df['trimestre'] = df['data'].dt.to_period('Q').astype(str)
-        df['ano'] = df['data'].dt.year.astype(str)
-        
-        return df
-    
-    except Exception as e:
-        st.error(f"Erro ao carregar arquivo: {str(e)}")
-        return None
-
-def create_filters(df):
+def create_filters(df, options):
     """Cria os filtros na sidebar."""
     st.sidebar.header("🔍 Filtros")
     
@@ -103,14 +65,14 @@ def create_filters(df):
     # Filtros de seleção múltipla
     empresas = st.sidebar.multiselect(
         "Empresas",
-        options=sorted(df['empresa'].unique()),
-        default=df['empresa'].unique()
+        options=options['empresa'],
+        default=options['empresa']
     )
     
     vendedores = st.sidebar.multiselect(
         "Vendedores",
-        options=sorted(df['vendedor'].unique()),
-        default=df['vendedor'].unique()
+        options=options['vendedor'],
+        default=options['vendedor']
     )
     
     # Filtro de valor
@@ -127,25 +89,42 @@ def create_filters(df):
         'val_range': val_range
     }
 
-def apply_filters(df, filters):
-    """Aplica os filtros selecionados."""
-    filtered_df = df.copy()
+def filters_key(filters):
+    """Converte os filtros em uma tupla hashável para a chave do cache."""
+    return (
+        tuple(filters['date_range']),
+        tuple(sorted(filters['empresas'])),
+        tuple(sorted(filters['vendedores'])),
+        tuple(filters['val_range'])
+    )
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def apply_filters(file_sig, _df, key):
+    """Aplica os filtros selecionados (cache por arquivo e combinação de filtros)."""
+    date_range, empresas, vendedores, val_range = key
+    tbl = pa.Table.from_pandas(_df, preserve_index=False)
     
-    # Filtros de data
-    filtered_df = filtered_df[
-        (filtered_df['data'].dt.date >= filters['date_range'][0]) & 
-        (filtered_df['data'].dt.date <= filters['date_range'][1])
+    # Filtros de data (fim inclusivo: até o início do dia seguinte)
+    start_ts = pa.scalar(pd.Timestamp(date_range[0]), type=tbl['data'].type)
+    end_ts = pa.scalar(pd.Timestamp(date_range[1]) + pd.Timedelta(days=1), type=tbl['data'].type)
+    masks = [
+        pc.greater_equal(tbl['data'], start_ts),
+        pc.less(tbl['data'], end_ts),
     ]
     
     # Outros filtros
-    filtered_df = filtered_df[
-        (filtered_df['empresa'].isin(filters['empresas'])) &
-        (filtered_df['vendedor'].isin(filters['vendedores'])) &
-        (filtered_df['valor'] >= filters['val_range'][0]) &
-        (filtered_df['valor'] <= filters['val_range'][1])
+    masks += [
+        pc.is_in(tbl['empresa'], value_set=pa.array(empresas, type=pa.string())),
+        pc.is_in(tbl['vendedor'], value_set=pa.array(vendedores, type=pa.string())),
+        pc.greater_equal(tbl['valor'], val_range[0]),
+        pc.less_equal(tbl['valor'], val_range[1]),
     ]
     
-    return filtered_df
+    mask = masks[0]
+    for m in masks[1:]:
+        mask = pc.and_kleene(mask, m)
+    
+    return tbl.filter(mask).to_pandas(types_mapper=pd.ArrowDtype, ignore_metadata=True)
 
 def display_metrics(df):
     """Exibe as métricas principais."""
@@ -167,7 +146,103 @@ def display_metrics(df):
     
     st.markdown("---")
 
-def create_visualizations(df):
+def _to_frame(tbl, names):
+    """Converte um resultado agregado do Arrow em DataFrame para os gráficos."""
+    columns = [pc.cast(col, col.type.value_type) if pa.types.is_dictionary(col.type) else col
+               for col in tbl.columns]
+    return pa.table(columns, names=names).to_pandas()
+
+def month_labels(codes):
+    """Converte códigos ano*12+mês-1 em rótulos 'AAAA-MM'."""
+    return [f"{code // 12}-{code % 12 + 1:02d}" for code in codes]
+
+def quarter_labels(codes):
+    """Converte códigos ano*4+trimestre-1 em rótulos 'AAAAQn'."""
+    return [f"{code // 4}Q{code % 4 + 1}" for code in codes]
+
+def with_period_labels(df):
+    """Troca os códigos de mês/trimestre pelos rótulos legíveis (prévia e exportação)."""
+    labeled = df.drop(columns=['mes_code', 'tri_code', 'ano'])
+    for col, code_col, labels in [('mês', 'mes_code', month_labels),
+                                  ('trimestre', 'tri_code', quarter_labels)]:
+        # Rótulos calculados só para os códigos distintos e depois mapeados
+        codes = df[code_col].unique()
+        labeled[col] = df[code_col].map(dict(zip(codes, labels(codes))))
+    labeled['ano'] = df['ano']
+    return labeled
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def compute_summaries(cache_key, _df):
+    """Calcula as agregações compartilhadas por gráficos e alertas."""
+    tbl = pa.Table.from_pandas(_df[['mes_code', 'vendedor', 'empresa', 'valor']], preserve_index=False)
+    
+    mensal = (tbl.group_by('mes_code').aggregate([('valor', 'sum')])
+              .select(['mes_code', 'valor_sum'])
+              .sort_by('mes_code'))
+    vendedor = (tbl.group_by('vendedor').aggregate([('valor', 'sum'), ('empresa', 'count_distinct')])
+                .select(['vendedor', 'valor_sum', 'empresa_count_distinct'])
+                .sort_by([('valor_sum', 'descending')]))
+    clientes = (tbl.group_by('empresa').aggregate([('valor', 'sum')])
+                .select(['empresa', 'valor_sum'])
+                .sort_by([('valor_sum', 'descending')])
+                .slice(0, 10))
+    
+    mensal = _to_frame(mensal, ['mes_code', 'valor'])
+    mensal['mês'] = month_labels(mensal['mes_code'])
+    
+    return {
+        'mensal': mensal,
+        'vendedor': _to_frame(vendedor, ['vendedor', 'valor', 'empresa']),
+        'clientes': _to_frame(clientes, ['empresa', 'valor'])
+    }
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def temporal_figure(cache_key, _temp_df):
+    """Gráfico de evolução mensal (reaproveitado enquanto os filtros não mudam)."""
+    fig = px.line(
+        _temp_df, x='mês', y='valor',
+        title="Vendas Mensais",
+        labels={'valor': 'Valor (R$)', 'mês': 'Mês'},
+        markers=True,
+        render_mode='webgl'
+    )
+    fig.update_layout(hovermode="x unified")
+    return fig
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def seller_figure(cache_key, _seller_df):
+    """Gráfico de vendas por vendedor."""
+    return px.bar(
+        _seller_df, x='vendedor', y='valor',
+        color='empresa',
+        title="Vendas por Vendedor",
+        labels={'valor': 'Valor (R$)', 'vendedor': 'Vendedor', 'empresa': 'Clientes Únicos'},
+        text_auto='.2s'
+    )
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def clients_figure(cache_key, _top_clients):
+    """Gráfico dos 10 maiores clientes."""
+    return px.bar(
+        _top_clients, x='empresa', y='valor',
+        title="Top 10 Clientes",
+        labels={'valor': 'Valor (R$)', 'empresa': 'Empresa'},
+        color='valor',
+        text_auto='.2s'
+    )
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def distribution_figure(cache_key, _df):
+    """Box plot de valores por vendedor."""
+    # Amostra limita o payload enviado ao navegador
+    df_plot = _df.sample(min(len(_df), 50_000), random_state=0)
+    return px.box(
+        df_plot, y='valor', x='vendedor',
+        title="Distribuição de Valores por Vendedor",
+        points="outliers"
+    )
+
+def create_visualizations(df, summaries, cache_key):
     """Cria as visualizações gráficas."""
     st.subheader("📈 Visualizações")
     
@@ -181,72 +256,69 @@ def create_visualizations(df):
     
     with tab1:
         # Evolução temporal
-        temp_df = df.groupby('mês').agg({'valor': 'sum'}).reset_index()
-        fig = px.line(
-            temp_df, x='mês', y='valor',
-            title="Vendas Mensais",
-            labels={'valor': 'Valor (R$)', 'mês': 'Mês'},
-            markers=True
-        )
-        fig.update_layout(hovermode="x unified")
+        fig = temporal_figure(cache_key, summaries['mensal'])
         st.plotly_chart(fig, use_container_width=True)
     
     with tab2:
         # Desempenho por vendedor
-        seller_df = df.groupby('vendedor').agg({
-            'valor': 'sum',
-            'empresa': 'nunique'
-        }).sort_values('valor', ascending=False).reset_index()
-        
-        fig = px.bar(
-            seller_df, x='vendedor', y='valor',
-            color='empresa',
-            title="Vendas por Vendedor",
-            labels={'valor': 'Valor (R$)', 'vendedor': 'Vendedor', 'empresa': 'Clientes Únicos'},
-            text_auto='.2s'
-        )
+        fig = seller_figure(cache_key, summaries['vendedor'])
         st.plotly_chart(fig, use_container_width=True)
     
     with tab3:
         # Top clientes
-        top_clients = df.groupby('empresa')['valor'].sum().nlargest(10).reset_index()
-        
-        fig = px.bar(
-            top_clients, x='empresa', y='valor',
-            title="Top 10 Clientes",
-            labels={'valor': 'Valor (R$)', 'empresa': 'Empresa'},
-            color='valor',
-            text_auto='.2s'
-        )
+        fig = clients_figure(cache_key, summaries['clientes'])
         st.plotly_chart(fig, use_container_width=True)
     
     with tab4:
         # Distribuição de valores
-        fig = px.box(
-            df, y='valor', x='vendedor',
-            title="Distribuição de Valores por Vendedor",
-            points="all"
-        )
+        fig = distribution_figure(cache_key, df)
         st.plotly_chart(fig, use_container_width=True)
 
-def display_alerts(df):
+@st.cache_data(max_entries=4, show_spinner=False)
+def to_parquet_bytes(cache_key, _df):
+    """Serializa os dados filtrados em Parquet (zstd) para exportação."""
+    buf = io.BytesIO()
+    # Sem metadados do pandas: o arquivo é lido por qualquer leitor Parquet
+    tbl = pa.Table.from_pandas(with_period_labels(_df), preserve_index=False).replace_schema_metadata()
+    pq.write_table(tbl, buf, compression='zstd')
+    return buf.getvalue()
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def to_csv_bytes(cache_key, _df):
+    """Serializa os dados filtrados em CSV (alternativa ao Parquet, gerada sob demanda)."""
+    out = with_period_labels(_df)
+    # Tipos NumPy no CSV, como no export original: datas sem hora quando todas são
+    # meia-noite e valores inteiros sem casa decimal
+    out['data'] = out['data'].astype('datetime64[ns]')
+    valor = out['valor'].astype('float64')
+    out['valor'] = valor.astype('int64') if (valor == valor.round()).all() else valor
+    return out.to_csv(index=False).encode('utf-8')
+
+def display_alerts(df, summaries):
     """Exibe alertas inteligentes."""
     st.sidebar.header("⚠️ Alertas")
     threshold = st.sidebar.number_input("Limite para alertas (R$)", value=10000)
     
     with st.expander("🔔 Alertas", expanded=True):
         # Vendedores abaixo do limiar
-        low_performers = df.groupby('vendedor')['valor'].sum()[lambda x: x < threshold]
+        seller_totals = summaries['vendedor'].set_index('vendedor')['valor']
+        low_performers = seller_totals[seller_totals < threshold]
         if not low_performers.empty:
             st.warning("**Vendedores com Baixo Desempenho**")
-            for seller, amount in low_performers.items():
-                st.write(f"- {seller}: R$ {amount:,.2f}")
+            st.dataframe(low_performers.to_frame("Valor").style.format({"Valor": "R$ {:,.2f}"}))
         
-        # Clientes inativos
-        latest_date = df['data'].max()
-        inactive = set(df['empresa'].unique()) - set(df[df['data'] >= (latest_date - pd.Timedelta(days=90))]['empresa'].unique())
-        if inactive:
-            st.warning(f"**Clientes Inativos (últimos 90 dias):** {len(inactive)}")
+        # Clientes inativos (diferença calculada sobre os códigos do dicionário)
+        tbl = pa.Table.from_pandas(df[['empresa', 'data']], preserve_index=False).combine_chunks()
+        if tbl.num_rows:
+            empresa = tbl['empresa'].chunk(0)
+            cutoff = pa.scalar(df['data'].max() - pd.Timedelta(days=90), type=tbl['data'].type)
+            recent = pc.greater_equal(tbl['data'], cutoff).chunk(0)
+            all_codes = pc.unique(empresa.indices)
+            active_codes = pc.unique(empresa.indices.filter(recent))
+            inactive_codes = all_codes.filter(pc.invert(pc.is_in(all_codes, value_set=active_codes)))
+            inactive = empresa.dictionary.take(inactive_codes)
+            if len(inactive):
+                st.warning(f"**Clientes Inativos (últimos 90 dias):** {len(inactive)}")
 
 # ========================================
 # FUNÇÃO PRINCIPAL
@@ -264,31 +336,44 @@ def main():
     )
     
     if uploaded_file is not None:
-        df = load_data(uploaded_file)
+        # Identidade pelo conteúdo, calculada uma vez e reaproveitada por todos os caches
+        file_sig = file_digest(uploaded_file)
+        df, options = load_sales(file_sig, uploaded_file, SCHEMA_VERSION)
         
         if df is not None:
             # Pré-visualização dos dados
             with st.expander("🔍 Visualizar Dados", expanded=False):
-                st.dataframe(df.head(3))
+                st.dataframe(with_period_labels(df.head(3)))
                 st.write(f"Registros carregados: {len(df):,}")
                 st.write(f"Período: {df['data'].min().date()} a {df['data'].max().date()}")
             
             # Filtros e processamento
-            filters = create_filters(df)
-            filtered_df = apply_filters(df, filters)
+            filters = create_filters(df, options)
+            key = filters_key(filters)
+            filtered_df = apply_filters(file_sig, df, key)
+            cache_key = (file_sig, key)
             
             # Exibição dos resultados
             display_metrics(filtered_df)
-            create_visualizations(filtered_df)
-            display_alerts(filtered_df)
+            summaries = compute_summaries(cache_key, filtered_df)
+            create_visualizations(filtered_df, summaries, cache_key)
+            display_alerts(filtered_df, summaries)
             
             # Exportação
             st.sidebar.download_button(
                 "💾 Exportar Dados",
-                data=filtered_df.to_csv(index=False).encode('utf-8'),
-                file_name=f"vendas_{datetime.now().strftime('%Y%m%d')}.csv",
-                mime="text/csv"
+                data=to_parquet_bytes(cache_key, filtered_df),
+                file_name=f"vendas_{datetime.now().strftime('%Y%m%d')}.parquet",
+                mime="application/vnd.apache.parquet"
             )
+            # CSV só é formatado quando pedido (o formatador é lento para muitos registros)
+            if st.sidebar.checkbox("Gerar também em CSV"):
+                st.sidebar.download_button(
+                    "📄 Exportar CSV",
+                    data=to_csv_bytes(cache_key, filtered_df),
+                    file_name=f"vendas_{datetime.now().strftime('%Y%m%d')}.csv",
+                    mime="text/csv"
+                )
     else:
         st.info("Carregue um arquivo para iniciar a análise")
 
@@ -0,0 +1,60 @@
+import io
+
+import pandas as pd
+
+from utils.io import SCHEMA_VERSION, load_sales
+
+
+class FakeUpload(io.BytesIO):
+    """Imita o UploadedFile do Streamlit (conteúdo + nome)."""
+
+    def __init__(self, content, name):
+        super().__init__(content.encode('utf-8'))
+        self.name = name
+
+
+def _load(content, name='vendas.csv'):
+    df, options = load_sales(f'{name}:{hash(content)}', FakeUpload(content, name), SCHEMA_VERSION)
+    assert df is not None
+    return df, options
+
+
+def test_csv_utc_timestamps_load_as_naive_utc():
+    df, _ = _load(
+        "Data,Valor,Cliente,Vendedor\n"
+        "2024-01-15T10:00:00Z,100,A,X\n"
+        "2024-01-16T11:00:00Z,50,B,Y\n"
+    )
+    assert len(df) == 2
+    assert df['data'].dt.tz is None
+    assert df['data'].tolist() == [pd.Timestamp('2024-01-15 10:00'), pd.Timestamp('2024-01-16 11:00')]
+
+
+def test_csv_offset_timestamps_load_as_naive_utc():
+    df, _ = _load(
+        "Data,Valor,Cliente,Vendedor\n"
+        "2024-01-15 10:00:00-03:00,100,A,X\n"
+        "2024-01-16 23:30:00-03:00,50,B,Y\n"
+    )
+    assert len(df) == 2
+    assert df['data'].dt.tz is None
+    assert df['data'].tolist() == [pd.Timestamp('2024-01-15 13:00'), pd.Timestamp('2024-01-17 02:30')]
+
+
+def test_csv_dayfirst_dates_still_parse():
+    df, _ = _load(
+        "Data,Valor,Cliente,Vendedor\n"
+        "15/01/2024,100,A,X\n"
+        "02/03/2024,50,B,Y\n"
+    )
+    assert df['data'].tolist() == [pd.Timestamp('2024-01-15'), pd.Timestamp('2024-03-02')]
+
+
+def test_csv_iso_dates_without_time_load():
+    df, _ = _load(
+        "Data,Valor,Cliente,Vendedor\n"
+        "2024-01-15,100,A,X\n"
+        "2024-01-16,50,B,Y\n"
+    )
+    assert df['data'].tolist() == [pd.Timestamp('2024-01-15'), pd.Timestamp('2024-01-16')]
+
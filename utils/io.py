@@ -0,0 +1,106 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import streamlit as st
+
+# ========================================
+# CARREGAMENTO COMPARTILHADO DOS DADOS DE VENDAS
+# ========================================
+
+# Versão do frame gerado por load_sales. O cache em disco só considera o código da
+# própria load_sales; ao alterar normalize_columns ou add_temporal_codes, incremente
+# este número para que frames antigos persistidos não sejam reaproveitados.
+SCHEMA_VERSION = 1
+
+def normalize_columns(df):
+    """Padroniza nomes de colunas, identifica a data e as colunas essenciais."""
+    # Padroniza nomes de colunas
+    df.columns = df.columns.str.lower().str.replace(' ', '_')
+    
+    # Identifica coluna de data automaticamente (convertida uma única vez, aqui no cache)
+    date_cols = [col for col in df.columns if any(keyword in col for keyword in ['data', 'date', 'dt'])]
+    if date_cols:
+        # Datas com fuso (ex.: '...Z', '-03:00') são normalizadas para UTC sem fuso
+        date_col = df[date_cols[0]]
+        if date_col.dtype.kind == 'M':
+            # (colunas date32 do Arrow não têm fuso nem suportam .dt.tz)
+            pa_type = getattr(date_col.dtype, 'pyarrow_dtype', None)
+            if getattr(date_col.dtype, 'tz', None) or getattr(pa_type, 'tz', None):
+                date_col = date_col.dt.tz_convert(None)
+            df['data'] = date_col.astype('datetime64[ns]')
+        else:
+            df['data'] = pd.to_datetime(date_col, errors='coerce', dayfirst=True, cache=True,
+                                        utc=True).dt.tz_convert(None)
+    
+    # Verifica colunas essenciais
+    required_cols = {'valor': ['valor', 'total', 'venda', 'amount'],
+                    'empresa': ['empresa', 'cliente', 'customer'],
+                    'vendedor': ['vendedor', 'responsavel', 'seller']}
+    
+    for standard_col, possible_cols in required_cols.items():
+        for col in possible_cols:
+            if col in df.columns:
+                df.rename(columns={col: standard_col}, inplace=True)
+                break
+    
+    return df
+
+def add_temporal_codes(df):
+    """Adiciona mês/trimestre/ano como códigos inteiros (rótulos só na hora de plotar)."""
+    ano = df['data'].dt.year.to_numpy().astype(np.int32)
+    df['mes_code'] = ano * 12 + df['data'].dt.month.to_numpy().astype(np.int32) - 1
+    df['tri_code'] = ano * 4 + df['data'].dt.quarter.to_numpy().astype(np.int32) - 1
+    df['ano'] = ano
+    return df
+
+def file_digest(uploaded_file):
+    """MD5 do conteúdo do arquivo, usado como identidade nos caches."""
+    return hashlib.md5(uploaded_file.getvalue()).hexdigest()
+
+@st.cache_data(
+    persist="disk",
+    max_entries=32,
+    show_spinner=False
+)
+def load_sales(file_sig, _uploaded_file, schema_version):
+    """Carrega e trata o arquivo de vendas (cache indexado por file_sig); retorna (df, opções)."""
+    try:
+        if _uploaded_file.name.endswith('.csv'):
+            df = pa_csv.read_csv(_uploaded_file).to_pandas(types_mapper=pd.ArrowDtype)
+        else:
+            df = pd.read_excel(_uploaded_file, engine='calamine', dtype_backend='pyarrow')
+        
+        df = normalize_columns(df)
+        
+        # Conversão de tipos e limpeza
+        # Com colunas Arrow, valores inválidos viram NaN (não nulo); a visão float64 deixa
+        # NaN e nulo iguais para o dropna (convert_dtypes devolve a coluna ao Arrow abaixo)
+        df['valor'] = pd.to_numeric(df['valor'], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        df = df.dropna(subset=['data', 'valor'])
+        
+        df = add_temporal_codes(df)
+        
+        # Colunas em Arrow: o cache serializa os buffers sem passar pelo pickle de blocos
+        df = df.convert_dtypes(dtype_backend='pyarrow')
+        df['valor'] = df['valor'].astype(pd.ArrowDtype(pa.float64()))
+        
+        # Colunas categóricas codificadas em dicionário (isin/unique/groupby operam sobre índices)
+        # (IDs numéricos viram texto antes, para o dicionário ser sempre de strings)
+        dict_type = pd.ArrowDtype(pa.dictionary(pa.int32(), pa.string()))
+        for col in ['empresa', 'vendedor']:
+            df[col] = df[col].astype(pd.ArrowDtype(pa.string())).astype(dict_type)
+        for col in ['segmento', 'cadência', 'motivo']:
+            if col in df.columns and pa.types.is_string(df[col].dtype.pyarrow_dtype):
+                df[col] = df[col].astype(dict_type)
+        
+        # Opções dos filtros calculadas uma vez por arquivo, não a cada rerun
+        options = {col: sorted(df[col].dropna().unique()) for col in ['empresa', 'vendedor']}
+        
+        return df, options
+    
+    except Exception as e:
+        st.error(f"Erro ao carregar arquivo: {str(e)}")
+        return None, None